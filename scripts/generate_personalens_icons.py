@@ -1,99 +1,110 @@
-import math, struct, zlib
+import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+from PIL import Image
+
 ROOT = Path(__file__).resolve().parents[1]
 ASSETS = ROOT / 'apps' / 'mobile' / 'assets'
 
 
-def chunk(tag: bytes, data: bytes) -> bytes:
-    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+def pack_rgba8(px):
+    # quantize the premultiplied float planes to straight-alpha RGBA8, once
+    h, w = px.shape[1:]
+    a = np.maximum(px[3], 1e-3)
+    rgba = np.empty((h, w, 4), dtype=np.uint8)
+    for k in range(3):
+        rgba[..., k] = np.rint(np.clip(px[k] * 255.0 / a, 0.0, 255.0)).astype(np.uint8)
+    rgba[..., 3] = np.rint(np.clip(px[3], 0.0, 255.0)).astype(np.uint8)
+    return rgba
+
 
+def save_png(path: Path, w: int, h: int, planes: np.ndarray):
+    # libpng picks scanline filters per row and runs SIMD CRC/deflate,
+    # so it beats the hand-rolled chunk framing on both speed and size
+    Image.fromarray(pack_rgba8(planes), 'RGBA').save(path, format='PNG', compress_level=6)
 
-def save_png(path: Path, w: int, h: int, rgba: bytearray):
-    raw = bytearray()
-    stride = w * 4
-    for y in range(h):
-        raw.append(0)
-        raw.extend(rgba[y*stride:(y+1)*stride])
-    compressed = zlib.compress(bytes(raw), level=9)
-    png = bytearray(b'\x89PNG\r\n\x1a\n')
-    png += chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0))
-    png += chunk(b'IDAT', compressed)
-    png += chunk(b'IEND', b'')
-    path.write_bytes(png)
+
+def premul(color):
+    r, g, b, a = color
+    return r * a / 255.0, g * a / 255.0, b * a / 255.0, a
 
 
 def make_canvas(w, h, bg=(0, 0, 0, 0)):
-    r, g, b, a = bg
-    px = bytearray(w * h * 4)
-    for i in range(0, len(px), 4):
-        px[i] = r
-        px[i+1] = g
-        px[i+2] = b
-        px[i+3] = a
+    # SoA float32 planes (R, G, B, A), premultiplied: channel-contiguous for
+    # the blend kernels and quantized only once, in save_png
+    r, g, b, a = premul(bg)
+    px = np.empty((4, h, w), dtype=np.float32)
+    px[0] = r
+    px[1] = g
+    px[2] = b
+    px[3] = a
     return px
 
 
-def blend(px, w, h, x, y, color):
-    if x < 0 or y < 0 or x >= w or y >= h:
-        return
-    sr, sg, sb, sa = color
-    if sa <= 0:
+def blend_region(px, y0, y1, x0, x1, src_rgb, src_a):
+    # Porter-Duff "over" for a bbox slice: src_a is a float (h,w) array in [0,1].
+    # The planes are premultiplied, so over is src*sa + dst*(1-sa) per channel
+    # with no division.
+    if y1 <= y0 or x1 <= x0:
         return
-    i = (y * w + x) * 4
-    dr, dg, db, da = px[i], px[i+1], px[i+2], px[i+3]
-    sa_f = sa / 255.0
-    da_f = da / 255.0
-    out_a = sa_f + da_f * (1 - sa_f)
-    if out_a <= 0:
-        px[i:i+4] = bytes((0, 0, 0, 0))
+    sa = np.asarray(src_a, dtype=np.float32)
+    # feathered shapes leave fully-transparent margins in their bbox; tighten
+    # to the rows/cols with any coverage
+    rows = np.flatnonzero(sa.any(axis=1))
+    if rows.size == 0:
         return
-    def comp(sc, dc):
-        return int(round((sc * sa_f + dc * da_f * (1 - sa_f)) / out_a))
-    px[i] = comp(sr, dr)
-    px[i+1] = comp(sg, dg)
-    px[i+2] = comp(sb, db)
-    px[i+3] = int(round(out_a * 255))
+    cols = np.flatnonzero(sa.any(axis=0))
+    r0, r1 = rows[0], rows[-1] + 1
+    c0, c1 = cols[0], cols[-1] + 1
+    sa = sa[r0:r1, c0:c1]
+    inv = 1.0 - sa
+    dst = px[:, y0 + r0:y0 + r1, x0 + c0:x0 + c1]
+    for k in range(3):
+        dst[k] = src_rgb[k] * sa + dst[k] * inv
+    dst[3] = 255.0 * sa + dst[3] * inv
 
 
-def lerp(a, b, t):
-    return a + (b - a) * t
-
-
-def mix(c1, c2, t):
-    return tuple(int(round(lerp(c1[i], c2[i], t))) for i in range(4))
+def fill_linear_gradient(px, w, h, c_tl, c_br):
+    c_tl = premul(c_tl)
+    c_br = premul(c_br)
+    tx = np.linspace(0.0, 1.0, w, dtype=np.float32)
+    ty = np.linspace(0.0, 1.0, h, dtype=np.float32)
+    t = np.clip((tx[None, :] * 0.6 + ty[:, None] * 0.9) / 1.5, 0.0, 1.0)
+    for k in range(4):
+        px[k] = c_tl[k] + (c_br[k] - c_tl[k]) * t
 
 
-def fill_linear_gradient(px, w, h, c_tl, c_br):
-    for y in range(h):
-        ty = y / max(1, h - 1)
-        for x in range(w):
-            tx = x / max(1, w - 1)
-            t = max(0.0, min(1.0, (tx * 0.6 + ty * 0.9) / 1.5))
-            c = mix(c_tl, c_br, t)
-            i = (y * w + x) * 4
-            px[i:i+4] = bytes(c)
+def centered_distance_field(w, h, cx, cy):
+    # shared by every primitive drawn around (cx, cy) so hypot runs once
+    ys = np.arange(h, dtype=np.float32) + 0.5 - cy
+    xs = np.arange(w, dtype=np.float32) + 0.5 - cx
+    return np.hypot(xs[None, :], ys[:, None])
 
 
-def draw_soft_circle(px, w, h, cx, cy, r, color, feather=1.5):
+def draw_soft_circle(px, w, h, cx, cy, r, color, feather=1.5, D=None):
     x0 = max(0, int(cx - r - feather - 1))
     x1 = min(w - 1, int(cx + r + feather + 1))
     y0 = max(0, int(cy - r - feather - 1))
     y1 = min(h - 1, int(cy + r + feather + 1))
     cr, cg, cb, ca = color
-    for y in range(y0, y1 + 1):
-        for x in range(x0, x1 + 1):
-            d = math.hypot(x + 0.5 - cx, y + 0.5 - cy)
-            a = 0.0
-            if d <= r - feather:
-                a = 1.0
-            elif d <= r + feather:
-                a = max(0.0, min(1.0, (r + feather - d) / (2 * feather)))
-            if a > 0:
-                blend(px, w, h, x, y, (cr, cg, cb, int(ca * a)))
-
-
-def draw_ring(px, w, h, cx, cy, r, thickness, color, feather=1.5):
+    if D is None:
+        ys = np.arange(y0, y1 + 1, dtype=np.float32) + 0.5 - cy
+        xs = np.arange(x0, x1 + 1, dtype=np.float32) + 0.5 - cx
+        d2 = xs[None, :] ** 2 + ys[:, None] ** 2
+        # squared compares classify most pixels; sqrt only on the feather band
+        r_in2 = max(0.0, r - feather) ** 2
+        a = (d2 <= r_in2).astype(np.float32)
+        band = (d2 > r_in2) & (d2 < (r + feather) ** 2)
+        a[band] = np.clip((r + feather - np.sqrt(d2[band])) / (2 * feather), 0.0, 1.0)
+    else:
+        d = D[y0:y1 + 1, x0:x1 + 1]
+        a = np.where(d <= r - feather, 1.0, np.clip((r + feather - d) / (2 * feather), 0.0, 1.0))
+    blend_region(px, y0, y1 + 1, x0, x1 + 1, (cr, cg, cb), a * (ca / 255.0))
+
+
+def draw_ring(px, w, h, cx, cy, r, thickness, color, feather=1.5, D=None):
     outer = r + thickness / 2
     inner = max(0.0, r - thickness / 2)
     x0 = max(0, int(cx - outer - feather - 1))
@@ -101,19 +112,19 @@ def draw_ring(px, w, h, cx, cy, r, thickness, color, feather=1.5):
     y0 = max(0, int(cy - outer - feather - 1))
     y1 = min(h - 1, int(cy + outer + feather + 1))
     cr, cg, cb, ca = color
-    for y in range(y0, y1 + 1):
-        for x in range(x0, x1 + 1):
-            d = math.hypot(x + 0.5 - cx, y + 0.5 - cy)
-            a = 0.0
-            if inner + feather <= d <= outer - feather:
-                a = 1.0
-            elif inner - feather <= d <= outer + feather:
-                # edge fade for both inner and outer boundaries
-                a_out = 1.0 if d <= outer - feather else max(0.0, min(1.0, (outer + feather - d) / (2 * feather)))
-                a_in = 1.0 if d >= inner + feather else max(0.0, min(1.0, (d - (inner - feather)) / (2 * feather)))
-                a = min(a_out, a_in)
-            if a > 0:
-                blend(px, w, h, x, y, (cr, cg, cb, int(ca * a)))
+    # signed distance to the ring band; one clip fades both edges symmetrically
+    if D is None:
+        ys = np.arange(y0, y1 + 1, dtype=np.float32) + 0.5 - cy
+        xs = np.arange(x0, x1 + 1, dtype=np.float32) + 0.5 - cx
+        d2 = xs[None, :] ** 2 + ys[:, None] ** 2
+        # squared compares skip sqrt inside the hole and outside the band
+        a = np.zeros(d2.shape, dtype=np.float32)
+        band = (d2 > max(0.0, inner - feather) ** 2) & (d2 < (outer + feather) ** 2)
+        a[band] = np.clip((thickness / 2 + feather - np.abs(np.sqrt(d2[band]) - r)) / (2 * feather), 0.0, 1.0)
+    else:
+        d = D[y0:y1 + 1, x0:x1 + 1]
+        a = np.clip((thickness / 2 + feather - np.abs(d - r)) / (2 * feather), 0.0, 1.0)
+    blend_region(px, y0, y1 + 1, x0, x1 + 1, (cr, cg, cb), a * (ca / 255.0))
 
 
 def draw_diag_glow(px, w, h, x0, y0, x1, y1, width, color, feather=3.0):
@@ -125,20 +136,13 @@ def draw_diag_glow(px, w, h, x0, y0, x1, y1, width, color, feather=3.0):
     maxy = min(h - 1, int(max(y0, y1) + width + feather + 2))
     vx, vy = x1 - x0, y1 - y0
     vlen2 = vx*vx + vy*vy + 1e-6
-    for y in range(miny, maxy + 1):
-        for x in range(minx, maxx + 1):
-            px0 = x + 0.5 - x0
-            py0 = y + 0.5 - y0
-            t = max(0.0, min(1.0, (px0*vx + py0*vy) / vlen2))
-            qx = x0 + vx*t
-            qy = y0 + vy*t
-            d = math.hypot(x + 0.5 - qx, y + 0.5 - qy)
-            if d <= width + feather:
-                if d <= width:
-                    a = 1.0
-                else:
-                    a = max(0.0, min(1.0, (width + feather - d) / feather))
-                blend(px, w, h, x, y, (cr, cg, cb, int(ca * a)))
+    X, Y = np.meshgrid(np.arange(minx, maxx + 1, dtype=np.float32) + 0.5,
+                       np.arange(miny, maxy + 1, dtype=np.float32) + 0.5)
+    # project pixel centers onto the segment, then distance to the foot point
+    t = np.clip(((X - x0) * vx + (Y - y0) * vy) / vlen2, 0.0, 1.0)
+    d = np.hypot(X - (x0 + vx * t), Y - (y0 + vy * t))
+    a = np.clip((width + feather - d) / feather, 0.0, 1.0)
+    blend_region(px, miny, maxy + 1, minx, maxx + 1, (cr, cg, cb), a * (ca / 255.0))
 
 
 def draw_rounded_rect_stroke(px, w, h, x, y, rw, rh, radius, thickness, color):
@@ -152,17 +156,13 @@ def draw_rounded_rect_stroke(px, w, h, x, y, rw, rh, radius, thickness, color):
     cy = y + rh/2
     hx = rw/2 - radius
     hy = rh/2 - radius
-    for py in range(y0, y1 + 1):
-        for pxl in range(x0, x1 + 1):
-            qx = abs((pxl + 0.5) - cx) - hx
-            qy = abs((py + 0.5) - cy) - hy
-            qx2 = max(qx, 0.0)
-            qy2 = max(qy, 0.0)
-            dist = math.hypot(qx2, qy2) + min(max(qx, qy), 0.0) - radius
-            ad = abs(dist)
-            if ad <= thickness:
-                a = max(0.0, 1.0 - ad / max(1.0, thickness))
-                blend(px, w, h, pxl, py, (cr, cg, cb, int(ca * a)))
+    X, Y = np.meshgrid(np.arange(x0, x1 + 1, dtype=np.float32) + 0.5,
+                       np.arange(y0, y1 + 1, dtype=np.float32) + 0.5)
+    qx = np.abs(X - cx) - hx
+    qy = np.abs(Y - cy) - hy
+    dist = np.hypot(np.maximum(qx, 0.0), np.maximum(qy, 0.0)) + np.minimum(np.maximum(qx, qy), 0.0) - radius
+    a = np.clip(1.0 - np.abs(dist) / max(1.0, thickness), 0.0, 1.0)
+    blend_region(px, y0, y1 + 1, x0, x1 + 1, (cr, cg, cb), a * (ca / 255.0))
 
 
 def draw_personalens_icon(px, w, h, transparent_bg=False):
@@ -176,15 +176,16 @@ def draw_personalens_icon(px, w, h, transparent_bg=False):
 
     cx, cy = w * 0.5, h * 0.5
     base_r = w * (0.25 if transparent_bg else 0.24)
+    D = centered_distance_field(w, h, cx, cy)
     # glow stack
-    draw_soft_circle(px, w, h, cx, cy, base_r*1.18, (0, 220, 255, 42 if transparent_bg else 60), feather=base_r*0.18)
-    draw_soft_circle(px, w, h, cx, cy, base_r*0.98, (255, 57, 168, 25 if transparent_bg else 36), feather=base_r*0.14)
+    draw_soft_circle(px, w, h, cx, cy, base_r*1.18, (0, 220, 255, 42 if transparent_bg else 60), feather=base_r*0.18, D=D)
+    draw_soft_circle(px, w, h, cx, cy, base_r*0.98, (255, 57, 168, 25 if transparent_bg else 36), feather=base_r*0.14, D=D)
     # lens body
-    draw_ring(px, w, h, cx, cy, base_r*0.95, base_r*0.22, (255, 255, 255, 235 if transparent_bg else 220), feather=2.2)
-    draw_ring(px, w, h, cx, cy, base_r*0.70, base_r*0.10, (130, 240, 255, 220), feather=2.0)
-    draw_ring(px, w, h, cx, cy, base_r*0.52, base_r*0.06, (255, 120, 220, 190), feather=1.6)
-    draw_soft_circle(px, w, h, cx, cy, base_r*0.43, (16, 22, 42, 235), feather=2.0)
-    draw_soft_circle(px, w, h, cx, cy, base_r*0.28, (40, 205, 255, 70), feather=base_r*0.10)
+    draw_ring(px, w, h, cx, cy, base_r*0.95, base_r*0.22, (255, 255, 255, 235 if transparent_bg else 220), feather=2.2, D=D)
+    draw_ring(px, w, h, cx, cy, base_r*0.70, base_r*0.10, (130, 240, 255, 220), feather=2.0, D=D)
+    draw_ring(px, w, h, cx, cy, base_r*0.52, base_r*0.06, (255, 120, 220, 190), feather=1.6, D=D)
+    draw_soft_circle(px, w, h, cx, cy, base_r*0.43, (16, 22, 42, 235), feather=2.0, D=D)
+    draw_soft_circle(px, w, h, cx, cy, base_r*0.28, (40, 205, 255, 70), feather=base_r*0.10, D=D)
     draw_soft_circle(px, w, h, cx + base_r*0.17, cy - base_r*0.17, base_r*0.12, (255,255,255,185), feather=base_r*0.04)
     draw_soft_circle(px, w, h, cx - base_r*0.22, cy + base_r*0.18, base_r*0.06, (255, 64, 153, 130), feather=base_r*0.03)
 
@@ -212,10 +213,19 @@ def main():
     ASSETS.mkdir(parents=True, exist_ok=True)
     tmp_dir = ASSETS / ".generated_tmp"
     tmp_dir.mkdir(exist_ok=True)
-    save_png(tmp_dir / 'icon-256.png', 256, 256, generate(256, transparent=False))
-    save_png(tmp_dir / 'adaptive-256.png', 256, 256, generate(256, transparent=True))
-    save_png(tmp_dir / 'splash-256.png', 256, 256, generate(256, transparent=True))
-    save_png(ASSETS / 'favicon.png', 48, 48, generate(48, transparent=False))
+    # the two renders are independent and CPU-bound, so draw them in parallel
+    with ProcessPoolExecutor(max_workers=2) as ex:
+        f_icon = ex.submit(generate, 256, False)
+        f_transparent = ex.submit(generate, 256, True)
+        icon256 = f_icon.result()
+        transparent256 = f_transparent.result()
+    save_png(tmp_dir / 'icon-256.png', 256, 256, icon256)
+    # adaptive and splash are the same transparent render; save it twice
+    save_png(tmp_dir / 'adaptive-256.png', 256, 256, transparent256)
+    save_png(tmp_dir / 'splash-256.png', 256, 256, transparent256)
+    # downsampling the 256px render beats re-running every primitive at 48px
+    # and gives smoother feathered edges
+    Image.fromarray(pack_rgba8(icon256), 'RGBA').resize((48, 48), Image.LANCZOS).save(ASSETS / 'favicon.png')
     print('generated base icons in', tmp_dir)
 
 